@@ -0,0 +1,83 @@
+import os
+import sys
+import argparse
+import tempfile
+import cv2
+import numpy as np
+from time import perf_counter
+from tifffile import TiffFile
+from tif_to_video import sort_tif_files, write_bigtiff
+
+'''
+Benchmark of compressed versus uncompressed bigTIFF export.
+Reads the first frames of an experiment directory, writes them as an uncompressed bigTIFF and as a compressed
+bigTIFF for each requested codec, then reads each file back in batches the way Suite2P does (tifffile, 500 frames
+per batch). Reports file size, compression ratio, and write and read throughput, and checks that every file
+(including short 3- and 4-frame stacks) reads back as one page per frame.
+
+Example usage: python benchmark_bigtiff_compression.py juanita/GCAMP_RF_I3C/1_0_I3C_5minTL.2023-04-11-16-42-07 --codecs zlib zstd
+'''
+
+# Create an argument parser
+parser = argparse.ArgumentParser()
+parser.add_argument('filepath', help='Filepath to an experiment directory containing .TIF images.')
+parser.add_argument('--frames', '-f', type=int, default=1000, help='Default: 1000. Number of frames to benchmark.')
+parser.add_argument('--codecs', nargs='+', default=['zlib'], help='Default: zlib. Codecs to compare with the uncompressed export.')
+parser.add_argument('--tile', type=int, nargs=2, default=None, metavar=('HEIGHT', 'WIDTH'), help='Default: strips. Tile shape for compressed bigTIFFs.')
+parser.add_argument('--workers', type=int, default=None, help='Default: chosen by tifffile. Number of threads used to compress pages.')
+parser.add_argument('--scratch', default=None, help='Default: system temporary directory. Where to write the benchmark files (use the network filesystem to include its read cost).')
+args = parser.parse_args()
+
+# Load the frames once, as tif_to_video does
+tif_files = sort_tif_files(args.filepath)[:args.frames]
+if len(tif_files)==0:
+    print('No TIFF files found in the specified directory.')
+    sys.exit()
+frames = np.stack([cv2.imread(os.path.join(args.filepath, f), 0) for f in tif_files])
+print(f'{len(frames)} frames of shape {frames.shape[1:]} ({frames.nbytes / 1e6:.1f} MB)')
+
+def read_bigtiff(filename, batch_size=500):
+    # read the file back in batches of frames, as Suite2P does with tifffile
+    with TiffFile(filename) as tif:
+        n_frames = len(tif.pages)
+        for i in range(0, n_frames, batch_size):
+            tif.asarray(key=range(i, min(i+batch_size, n_frames)))
+
+def check_pages(filename, frames):
+    # Suite2P reads one frame per page, so the page count and pixel data must match the frames written
+    with TiffFile(filename) as tif:
+        assert len(tif.pages) == len(frames), f'{filename}: {len(tif.pages)} pages for {len(frames)} frames'
+        assert np.array_equal(tif.asarray(key=range(len(frames))).reshape(frames.shape), frames), f'{filename}: data mismatch'
+
+with tempfile.TemporaryDirectory(dir=args.scratch) as tmpdir:
+    # short stacks, as written for remainder chunks, must not be stored as RGB(A) pages
+    for codec in [None] + args.codecs:
+        for n_frames in [3, 4]:
+            filename = os.path.join(tmpdir, f'check_{codec or "uncompressed"}_{n_frames}.tif')
+            write_bigtiff(filename, frames[:n_frames], compression=codec)
+            check_pages(filename, frames[:n_frames])
+            os.remove(filename)
+    print('Page check passed for 3- and 4-frame stacks')
+
+    results = []
+    for codec in [None] + args.codecs:
+        filename = os.path.join(tmpdir, f'benchmark_{codec or "uncompressed"}.tif')
+
+        start = perf_counter()
+        write_bigtiff(filename, frames, compression=codec, tile=tuple(args.tile) if args.tile else None,
+                      maxworkers=args.workers)
+        write_time = perf_counter() - start
+
+        start = perf_counter()
+        read_bigtiff(filename)
+        read_time = perf_counter() - start
+        check_pages(filename, frames)
+
+        results.append((codec or 'none', os.path.getsize(filename), write_time, read_time))
+        os.remove(filename)
+
+uncompressed_size = results[0][1]
+print(f'{"codec":>8} {"size (MB)":>10} {"ratio":>6} {"write (MB/s)":>13} {"read (MB/s)":>12}')
+for codec, size, write_time, read_time in results:
+    print(f'{codec:>8} {size / 1e6:>10.1f} {uncompressed_size / size:>6.2f} '
+          f'{frames.nbytes / 1e6 / write_time:>13.1f} {frames.nbytes / 1e6 / read_time:>12.1f}')
@@ -3,6 +3,13 @@ from tif_to_video import *
 import sys
 import argparse
 
+def bin_factor(value):
+    # bin factors must be integers of at least 1
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'bin factors must be at least 1, got {value}')
+    return value
+
 # Create an argument parser
 parser = argparse.ArgumentParser()
 
@@ -17,6 +24,21 @@ parser.add_argument('--batch', '-b', choices=['y', 'n'], default='y', help='Defa
 
 parser.add_argument('--overwrite', '-w', choices=['y', 'n'], default='n', help='Default: n. Overwrite bigtiffs directory? (y/n). If no, will skip directory.')
 
+# Add optional arguments for lossless compression of the bigTIFFs
+parser.add_argument('--compression', '-c', choices=['none', 'zlib', 'zstd', 'lzma', 'lzw'], default='none', help='Default: none. Lossless codec for the bigTIFFs (zstd and lzw need the imagecodecs package).')
+parser.add_argument('--predictor', choices=['y', 'n'], default='y', help='Default: y. Apply the horizontal predictor before compressing? (y/n)')
+parser.add_argument('--tile', type=int, nargs=2, default=None, metavar=('HEIGHT', 'WIDTH'), help='Default: strips. Tile shape for compressed bigTIFFs (multiples of 16).')
+parser.add_argument('--workers', type=int, default=None, help='Default: chosen by tifffile. Number of threads used to compress pages.')
+
+# Add optional arguments for binning the exported frames
+parser.add_argument('--spatial-bin', type=bin_factor, default=1, help='Default: 1. Block size for block-mean spatial binning of the bigTIFF frames.')
+parser.add_argument('--temporal-bin', type=bin_factor, default=1, help='Default: 1. Number of frames averaged into each bigTIFF frame.')
+
+# Add optional arguments for the AVI preview movie
+parser.add_argument('--preview', '-p', choices=['y', 'n'], default='n', help='Default: n. Also export a contrast-scaled AVI preview movie? (y/n)')
+parser.add_argument('--preview-spatial-bin', type=bin_factor, default=1, help='Default: 1. Spatial bin size of the preview movie.')
+parser.add_argument('--preview-temporal-bin', type=bin_factor, default=1, help='Default: 1. Number of frames averaged into each preview frame.')
+
 # Parse the command line arguments
 args = parser.parse_args()
 
@@ -24,6 +46,10 @@ args = parser.parse_args()
 print('File path:', args.filepath)
 print('Output filename:', args.output)
 print('Batch:', args.batch)
+print('Compression:', args.compression)
+print('Preview:', args.preview)
+print('Spatial bin:', args.spatial_bin)
+print('Temporal bin:', args.temporal_bin)
 
 # define the path to the input directory
 input_path = args.filepath
@@ -37,6 +63,23 @@ if args.overwrite == 'y':
 else:
     overwrite = False
 
+# define the bigTIFF compression settings
+compression_kwargs = {
+    'compression': None if args.compression == 'none' else args.compression,
+    'predictor': args.predictor == 'y',
+    'tile': tuple(args.tile) if args.tile is not None else None,
+    'maxworkers': args.workers,
+}
+
+# define the preview movie and binning settings
+preview_kwargs = {
+    'preview': args.preview == 'y',
+    'preview_spatial_bin': args.preview_spatial_bin,
+    'preview_temporal_bin': args.preview_temporal_bin,
+    'spatial_bin': args.spatial_bin,
+    'temporal_bin': args.temporal_bin,
+}
+
 # define whether batch processing or not
 if args.batch == 'y':
     batch = True
@@ -56,14 +99,14 @@ if batch == True:
                 # if overwrite is True, generate the bigtiffs directory
                 if overwrite == True:
                     print('overwriting bigtiffs directory')
-                    tif_to_video(dir_path, output_filename)
+                    tif_to_video(dir_path, output_filename, **compression_kwargs, **preview_kwargs)
                 # if overwrite is False, skip the directory
                 else:
                     print('bigtiffs directory already exists')
                     continue
             else: 
-                tif_to_video(dir_path, output_filename)
+                tif_to_video(dir_path, output_filename, **compression_kwargs, **preview_kwargs)
 else:
     print('single directory processing')
-    tif_to_video(input_path, output_filename)
+    tif_to_video(input_path, output_filename, **compression_kwargs, **preview_kwargs)
                 
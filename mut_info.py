@@ -3,7 +3,9 @@ import os
 from sklearn.feature_selection import mutual_info_regression
 import sys
 import multiprocessing as mp
-from time import gmtime, strftime
+from time import gmtime, strftime, time
+from scipy.special import ndtri
+from scipy.stats import rankdata, pearsonr, spearmanr
 sys.path.append('/cluster/tufts/levinlab/rellis01/calcium/varley')
 from varley.local_mi import local_total_correlation
 from tqdm import tqdm
@@ -14,29 +16,83 @@ Mutual information calculation for calcium imaging data.
 The mutual information between two random variables is a measure of the mutual dependence between the two variables.
 The mutual information between two vectors is calculated using the mutual_info_regression function from sklearn.
 The mutual information between two vectors is calculated using the local_total_correlation function from varley.
+The 'gcmi' type computes the Gaussian-copula mutual information of all pairs from one copula correlation matrix.
 Arguments:
     root (str): Path to the Suite2P output directory.
-    mi_type (str): Type of mutual information calculation, 'global' or 'local'.
+    mi_type (str): Type of mutual information calculation, 'global', 'gcmi', 'local' or 'higher_order'
+        (total correlation and O-information over cell triplets).
     overwrite (str): Whether to overwrite existing files, 'True' or 'False'.
+    precision (str, optional): Precision used to compute and store the results, 'float64' (default) or 'float32'.
+        float32 runs recompute a random sample of pairs in float64 and print the maximum and mean deviation.
+    triplets (str, optional): Triplet selection for 'higher_order', 'sample' (default), 'spatial' or 'all'.
+        Local values are not computed for 'all'.
+    triplet_param (float, optional): Number of sampled triplets for 'sample' (default 100000), or the maximum
+        distance in pixels between cells for 'spatial' (default 100).
 Returns:
     None. Saves the mutual information matrix to a file named "mut_info_matrix.npy".
 '''
 
-def global_mi(data, sdir):
+# supported precisions for computing and storing mutual information
+PRECISIONS = {'float32': np.float32, 'float64': np.float64}
+
+def precision_report(mi_matrix, data, pair_mi, n_pairs=20, seed=0):
+    """
+    Recompute a random sample of pairs in float64 and report the deviation from the stored results.
+
+    Args:
+        mi_matrix (ndarray): Mutual information matrix computed at reduced precision, indexed by [i, j].
+        data (ndarray): Input data, a 2D array where each row represents a vector.
+        pair_mi (callable): Function taking (data, i, j) and returning the mutual information of rows i and j.
+        n_pairs (int): Number of pairs to check. Defaults to 20.
+        seed (int): Seed for sampling the pairs. Defaults to 0.
+
+    Returns:
+        dict: Maximum and mean absolute deviation over the sampled pairs.
+    """
+    n = len(data)
+    data = data.astype(np.float64)
+
+    # sample distinct pairs (i < j)
+    rng = np.random.default_rng(seed)
+    pairs = set()
+    n_pairs = min(n_pairs, n * (n - 1) // 2)
+    while len(pairs) < n_pairs:
+        i, j = sorted(rng.choice(n, size=2, replace=False))
+        pairs.add((i, j))
+
+    deviations = []
+    for i, j in sorted(pairs):
+        reference = np.asarray(pair_mi(data, i, j), dtype=np.float64)
+        deviations.append(np.abs(mi_matrix[i, j].astype(np.float64) - reference).ravel())
+    deviations = np.concatenate(deviations)
+
+    report = {'n_pairs': n_pairs, 'max_deviation': deviations.max(), 'mean_deviation': deviations.mean()}
+    print(f"Precision check over {report['n_pairs']} pairs: "
+          f"max deviation {report['max_deviation']:.3e}, mean deviation {report['mean_deviation']:.3e}")
+    return report
+
+def global_pair_mi(data, i, j):
+    return mutual_info_regression(data[i].reshape(-1, 1), data[j], n_neighbors=5, random_state=0)[0]
+
+def global_mi(data, sdir, precision='float64'):
 
     """
     Calculate mutual information between pairs of vectors using parallel processing.
 
     Args:
         data (ndarray): Input data, a 2D array where each row represents a vector.
+        precision (str): 'float64' (default) or 'float32'. Precision of the input data and the saved matrix.
 
     Returns:
         None. Saves the mutual information matrix to a file named "mut_info_matrix.npy".
     """
 
+    dtype = PRECISIONS[precision]
+    data = data.astype(dtype)
+
     # create a square matrix to store the mutual information values
     n = len(data)
-    mi_matrix = np.zeros((n, n))
+    mi_matrix = np.zeros((n, n), dtype=dtype)
 
     results = Parallel(n_jobs=-1, verbose=51)(
         delayed(mutual_info_regression)(
@@ -52,28 +108,147 @@ def global_mi(data, sdir):
             mi_matrix[j, i] = results[idx]
             idx += 1
 
+    # compare a sample of pairs against a float64 computation
+    if dtype != np.float64:
+        precision_report(mi_matrix, data, global_pair_mi)
+
     # save the mutual information matrix to a file
     filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_mut_info_matrix.npy')
     np.save(filename, mi_matrix)
 
+def copula_normalize(data):
+    """
+    Rank-transform each row to a standard normal copula and scale it to unit norm.
+
+    Args:
+        data (ndarray): Input data, a 2D array where each row represents a vector.
+
+    Returns:
+        ndarray: Copula-normalised data with zero mean and unit norm rows, so that the
+            correlation matrix is a plain matrix product. Constant rows are left as zeros
+            (zero correlation, and so zero MI, with every other row).
+    """
+    T = data.shape[1]
+    copula = ndtri(rankdata(data, axis=1) / (T + 1))
+    copula -= copula.mean(axis=1, keepdims=True)
+    norm = np.linalg.norm(copula, axis=1, keepdims=True)
+    norm[norm == 0] = 1
+    copula /= norm
+    return copula
+
+def gcmi_pair(copula, i, j):
+    r = copula[i] @ copula[j]
+    return -0.5 * np.log1p(-np.clip(r ** 2, 0, 1 - 1e-12))
+
+def gcmi(data, sdir, precision='float64', block_size=1024):
+    """
+    Calculate Gaussian-copula mutual information between all pairs of vectors.
+
+    Each trace is rank-transformed once to a standard normal copula; the MI of every pair is then
+    -0.5 * log(1 - r**2) of their copula correlation r. Compared to the k-NN estimator of global_mi,
+    this is a (lower bound) parametric estimate but takes seconds instead of hours.
+
+    Args:
+        data (ndarray): Input data, a 2D array where each row represents a vector.
+        precision (str): 'float64' (default) or 'float32'. Precision of the copula data and the saved matrix.
+        block_size (int): Number of columns of the MI matrix computed per matrix product, to limit
+            memory use on large recordings. Defaults to 1024.
+
+    Returns:
+        None. Saves the mutual information matrix to a file named "F_gcmi_matrix.npy".
+    """
+    dtype = PRECISIONS[precision]
+    start = time()
+
+    copula64 = copula_normalize(data.astype(np.float64))
+    copula = copula64.astype(dtype)
+    n = len(copula)
+
+    mi_matrix = np.zeros((n, n), dtype=dtype)
+    for i in range(0, n, block_size):
+        r = (copula @ copula[i:i+block_size].T).astype(np.float64)
+        mi_matrix[:, i:i+block_size] = -0.5 * np.log1p(-np.clip(r ** 2, 0, 1 - 1e-12))
+    np.fill_diagonal(mi_matrix, 0)
+    print(f'Gaussian-copula MI for {n} cells computed in {time() - start:.2f} s')
+
+    # compare a sample of pairs against a float64 computation
+    if dtype != np.float64:
+        precision_report(mi_matrix, copula64, gcmi_pair)
+    del copula64
+
+    gcmi_report(mi_matrix, data, sdir)
+
+    filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_gcmi_matrix.npy')
+    np.save(filename, mi_matrix)
+
+def gcmi_report(mi_matrix, data, sdir, n_pairs=200, seed=0):
+    """
+    Compare a Gaussian-copula MI matrix with the k-NN (KSG) estimate of global_mi on the same data.
+
+    Uses the saved "F_mut_info_matrix.npy" if it exists, otherwise computes the KSG estimate for a
+    random sample of pairs.
+
+    Args:
+        mi_matrix (ndarray): Gaussian-copula mutual information matrix.
+        data (ndarray): Input data, a 2D array where each row represents a vector.
+        n_pairs (int): Number of pairs to compute with KSG if no saved matrix exists. Defaults to 200.
+        seed (int): Seed for sampling the pairs. Defaults to 0.
+
+    Returns:
+        dict: Number of pairs compared, Pearson and Spearman correlation, and mean and maximum absolute difference.
+    """
+    n = len(data)
+    ksg_filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_mut_info_matrix.npy')
+    if os.path.isfile(ksg_filename):
+        print(f'Comparing with {ksg_filename}')
+        i, j = np.triu_indices(n, 1)
+        ksg = np.load(ksg_filename)[i, j]
+    else:
+        print(f'{ksg_filename} does not exist, comparing with KSG on {n_pairs} sampled pairs')
+        rng = np.random.default_rng(seed)
+        i, j = np.triu_indices(n, 1)
+        sample = rng.choice(len(i), size=min(n_pairs, len(i)), replace=False)
+        i, j = i[sample], j[sample]
+        data = data.astype(np.float64)
+        ksg = np.array(Parallel(n_jobs=-1)(delayed(global_pair_mi)(data, a, b) for a, b in zip(i, j)))
+
+    gc = mi_matrix[i, j].astype(np.float64)
+    report = {
+        'n_pairs': len(gc),
+        'pearson': pearsonr(gc, ksg)[0],
+        'spearman': spearmanr(gc, ksg)[0],
+        'mean_abs_diff': np.abs(gc - ksg).mean(),
+        'max_abs_diff': np.abs(gc - ksg).max(),
+    }
+    print(f"GCMI vs KSG over {report['n_pairs']} pairs: pearson {report['pearson']:.3f}, "
+          f"spearman {report['spearman']:.3f}, mean abs diff {report['mean_abs_diff']:.3e}, "
+          f"max abs diff {report['max_abs_diff']:.3e}")
+    return report
+
 def local_total_correlation_wrapper(data):
     return local_total_correlation(data)
 
-def local_mi(data, sdir):
+def local_pair_mi(data, i, j):
+    return local_total_correlation(data[[i, j]])
+
+def local_mi(data, sdir, precision='float64'):
     """
     Calculate local mutual information between pairs of vectors using parallel processing.
 
     Args:
         data (ndarray): Input data, a 2D array where each row represents a vector.
+        precision (str): 'float64' (default) or 'float32'. Precision of the input data, the cython
+            kernels and the saved matrix.
 
     Returns:
         None. Saves the local mutual information matrices to separate files in chunks.
     """
+    dtype = PRECISIONS[precision]
     n = len(data)
-    mi_matrix = np.zeros((n, n, data.shape[1]))
+    mi_matrix = np.zeros((n, n, data.shape[1]), dtype=dtype)
 
-    # convert data to float64 (required for cython function)
-    data = data.astype(np.float64)
+    # convert data to float32 or float64 (the cython function accepts either)
+    data = np.ascontiguousarray(data, dtype=dtype)
 
     # calculate the mutual information between all pairs of vectors and store in the matrix
     print('starting loop')
@@ -86,18 +261,206 @@ def local_mi(data, sdir):
             mi_matrix[i, j] = results[idx]
             mi_matrix[j, i] = results[idx]
             idx += 1
+
+    # compare a sample of pairs against a float64 computation
+    if dtype != np.float64:
+        precision_report(mi_matrix, data, local_pair_mi)
     
     # Save data
     filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_local_mut_info_matrix.npy')
     np.save(filename, mi_matrix)
 
+def all_triplets(n):
+    """
+    All triplets (i < j < k) of n cells.
+
+    Args:
+        n (int): Number of cells.
+
+    Returns:
+        ndarray: Array of shape (n_triplets, 3) with the cell indices of each triplet.
+    """
+    triplets = [np.empty((0, 3), dtype=np.int32)]
+    for i in range(n - 2):
+        # pairs (j, k) with i < j < k
+        j, k = np.triu_indices(n - i - 1, 1)
+        triplets.append(np.column_stack((np.full(len(j), i), j + i + 1, k + i + 1)).astype(np.int32))
+    return np.concatenate(triplets)
+
+def sample_triplets(n, n_triplets, seed=0):
+    """
+    A random sample of distinct triplets (i < j < k) of n cells.
+
+    Args:
+        n (int): Number of cells.
+        n_triplets (int): Number of triplets to sample. Capped at the total number of triplets.
+        seed (int): Seed for sampling the triplets. Defaults to 0.
+
+    Returns:
+        ndarray: Array of shape (n_triplets, 3) with the cell indices of each triplet.
+    """
+    n_triplets = min(n_triplets, n * (n - 1) * (n - 2) // 6)
+    rng = np.random.default_rng(seed)
+    triplets = np.empty((0, 3), dtype=np.int32)
+    while len(triplets) < n_triplets:
+        draws = np.sort(rng.integers(0, n, size=(n_triplets, 3)), axis=1)
+        # drop draws with repeated cells, then duplicate triplets
+        draws = draws[(draws[:, 0] != draws[:, 1]) & (draws[:, 1] != draws[:, 2])]
+        triplets = np.unique(np.concatenate((triplets, draws.astype(np.int32))), axis=0)
+    return triplets[rng.permutation(len(triplets))[:n_triplets]]
+
+def spatial_triplets(centroids, radius):
+    """
+    Triplets (i < j < k) of cells whose centroids are all within radius of each other.
+
+    Args:
+        centroids (ndarray): Array of shape (n, 2) with the pixel coordinates of each cell (Suite2P stat['med']).
+        radius (float): Maximum distance in pixels between any two cells of a triplet.
+
+    Returns:
+        ndarray: Array of shape (n_triplets, 3) with the cell indices of each triplet.
+    """
+    n = len(centroids)
+    dist = np.linalg.norm(centroids[:, None, :] - centroids[None, :, :], axis=-1)
+    adjacent = dist <= radius
+
+    triplets = [np.empty((0, 3), dtype=np.int32)]
+    for i in range(n - 2):
+        # neighbours of i with a higher index
+        nbrs = np.flatnonzero(adjacent[i, i+1:]) + i + 1
+        j, k = np.triu_indices(len(nbrs), 1)
+        j, k = nbrs[j], nbrs[k]
+        keep = adjacent[j, k]
+        triplets.append(np.column_stack((np.full(keep.sum(), i), j[keep], k[keep])).astype(np.int32))
+    return np.concatenate(triplets)
+
+def higher_order_batch(cov, triplets, data=None):
+    """
+    Gaussian total correlation and O-information for a batch of cell subsets.
+
+    All determinants and inverses are computed at once on the stacked covariance submatrices
+    taken from the global covariance matrix, instead of one np.cov/np.linalg.inv call per subset.
+
+    Args:
+        cov (ndarray): Covariance matrix of all cells, shape (n, n).
+        triplets (ndarray): Array of shape (batch, k) with the cell indices of each subset (k >= 3).
+        data (ndarray, optional): Mean-centred data, shape (n, timepoints). If given, the local
+            (per-timepoint) total correlation and O-information are also returned.
+
+    Returns:
+        tuple: (tc, oinfo) of shape (batch,), followed by (local_tc, local_oinfo) of shape
+            (batch, timepoints) if data is given.
+    """
+    k = triplets.shape[1]
+    # stacked covariance submatrices, shape (batch, k, k)
+    sub = cov[triplets[:, :, None], triplets[:, None, :]]
+    variances = np.diagonal(sub, axis1=1, axis2=2)
+    logdet = np.linalg.slogdet(sub)[1]
+
+    # submatrices with one cell left out, shape (k, batch, k-1, k-1)
+    leave_one_out = [np.delete(np.arange(k), j) for j in range(k)]
+    sub_loo = np.stack([sub[:, idx[:, None], idx[None, :]] for idx in leave_one_out])
+    logdet_loo = np.linalg.slogdet(sub_loo)[1]
+
+    # TC = sum_i H(X_i) - H(X); O = (k-2) H(X) + sum_j [H(X_j) - H(X_-j)]
+    # (the (2*pi*e) terms of the Gaussian entropies cancel in both)
+    sum_log_var = np.log(variances).sum(axis=1)
+    tc = 0.5 * (sum_log_var - logdet)
+    oinfo = 0.5 * ((k - 2) * logdet + sum_log_var - logdet_loo.sum(axis=0))
+
+    if data is None:
+        return tc, oinfo
+
+    # local entropies up to the (2*pi) terms, which again cancel
+    X = data[triplets]  # (batch, k, timepoints)
+    marg = (X ** 2 / variances[:, :, None] + np.log(variances)[:, :, None]).sum(axis=1)
+    joint = np.einsum('bit,bij,bjt->bt', X, np.linalg.inv(sub), X, optimize=True) + logdet[:, None]
+    loo = np.zeros_like(joint)
+    for j, idx in enumerate(leave_one_out):
+        X_loo = X[:, idx]
+        loo += np.einsum('bit,bij,bjt->bt', X_loo, np.linalg.inv(sub_loo[j]), X_loo, optimize=True)
+        loo += logdet_loo[j][:, None]
+
+    local_tc = 0.5 * (marg - joint)
+    local_oinfo = 0.5 * ((k - 2) * joint + marg - loo)
+    return tc, oinfo, local_tc, local_oinfo
+
+def higher_order_mi(data, sdir, triplets, local=True, precision='float64', batch_size=2000):
+    """
+    Calculate average and local total correlation and O-information over cell triplets using parallel processing.
+
+    The data are z-scored and one global covariance matrix is computed; batches of triplets are then
+    processed in parallel with stacked determinant and inverse computations (see higher_order_batch).
+    Each group of batches is written straight into memory-mapped .npy outputs, so the local values
+    never have to fit in memory.
+
+    Args:
+        data (ndarray): Input data, a 2D array where each row represents a vector.
+        triplets (ndarray): Array of shape (n_triplets, 3) with the cell indices of each triplet
+            (see all_triplets, sample_triplets and spatial_triplets).
+        local (bool): Whether to also compute and save the local (per-timepoint) values. Defaults to True.
+        precision (str): 'float64' (default) or 'float32'. Precision of the saved results.
+        batch_size (int): Number of triplets per parallel task. Defaults to 2000.
+
+    Returns:
+        None. Saves the triplets, total correlation and O-information (and their local values) to
+        files named "F_higher_order_*.npy".
+    """
+    dtype = PRECISIONS[precision]
+    plane_dir = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0')
+
+    # z-score the data (total correlation and O-information are scale-invariant, this only conditions the covariance)
+    data = data.astype(np.float64)
+    data = (data - data.mean(axis=1, keepdims=True)) / data.std(axis=1, keepdims=True)
+    cov = np.cov(data, ddof=0)
+
+    n_triplets, T = len(triplets), data.shape[1]
+    np.save(os.path.join(plane_dir, 'F_higher_order_triplets.npy'), triplets)
+    if n_triplets == 0:
+        print('No triplets selected, saving empty outputs')
+        for name in ['tc', 'oinfo']:
+            np.save(os.path.join(plane_dir, f'F_higher_order_{name}.npy'), np.zeros(0, dtype=dtype))
+        if local:
+            for name in ['local_tc', 'local_oinfo']:
+                np.save(os.path.join(plane_dir, f'F_higher_order_{name}.npy'), np.zeros((0, T), dtype=dtype))
+        return
+
+    # memory-mapped outputs, filled one group of batches at a time
+    outputs = [
+        np.lib.format.open_memmap(os.path.join(plane_dir, 'F_higher_order_tc.npy'), mode='w+', dtype=dtype, shape=(n_triplets,)),
+        np.lib.format.open_memmap(os.path.join(plane_dir, 'F_higher_order_oinfo.npy'), mode='w+', dtype=dtype, shape=(n_triplets,)),
+    ]
+    if local:
+        print(f'Local values: 2 arrays of {n_triplets * T * np.dtype(dtype).itemsize / 1e9:.2f} GB on disk')
+        outputs += [
+            np.lib.format.open_memmap(os.path.join(plane_dir, 'F_higher_order_local_tc.npy'), mode='w+', dtype=dtype, shape=(n_triplets, T)),
+            np.lib.format.open_memmap(os.path.join(plane_dir, 'F_higher_order_local_oinfo.npy'), mode='w+', dtype=dtype, shape=(n_triplets, T)),
+        ]
+
+    starts = list(range(0, n_triplets, batch_size))
+    print(f'{n_triplets} triplets in {len(starts)} batches')
+    group_size = 2 * (os.cpu_count() or 1)
+    with Parallel(n_jobs=-1) as parallel:
+        for g in tqdm(range(0, len(starts), group_size), desc='Triplet batch groups'):
+            group = starts[g:g+group_size]
+            results = parallel(
+                delayed(higher_order_batch)(cov, triplets[i:i+batch_size], data if local else None) for i in group
+            )
+            for i, result in zip(group, results):
+                for output, values in zip(outputs, result):
+                    output[i:i+len(values)] = values
+
+    for output in outputs:
+        output.flush()
+    del outputs
+
 if __name__ == '__main__':
     # Define the path to the Suite2P output
     root = sys.argv[1]
     print(root)
 
     # type of mutual information calculation
-    mi_type = sys.argv[2] # 'local' or 'global'
+    mi_type = sys.argv[2] # 'local', 'global', 'gcmi' or 'higher_order'
     print(mi_type)
 
     # whether to overwrite existing files
@@ -109,6 +472,21 @@ if __name__ == '__main__':
     else:
         print('Incorrect entry for overwrite argument...')
 
+    # precision used to compute and store the results, 'float64' (default) or 'float32'
+    precision = sys.argv[4] if len(sys.argv) > 4 else 'float64'
+    if precision not in PRECISIONS:
+        print(f'Incorrect entry for precision argument, must be one of {list(PRECISIONS)}')
+        sys.exit()
+    print(precision)
+
+    # triplet selection for higher-order analysis: 'sample', 'spatial' or 'all'
+    triplet_selection = sys.argv[5] if len(sys.argv) > 5 else 'sample'
+    if mi_type == 'higher_order':
+        if triplet_selection not in ['sample', 'spatial', 'all']:
+            print("Incorrect entry for triplets argument, must be 'sample', 'spatial' or 'all'")
+            sys.exit()
+        print(triplet_selection)
+
     # create an empty list to store the subdirectories
     subdirectories = []
 
@@ -127,9 +505,13 @@ if __name__ == '__main__':
             # initialize filename
             if mi_type == 'global':
                 filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_mut_info_matrix.npy')
+            elif mi_type == 'gcmi':
+                filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_gcmi_matrix.npy')
             elif mi_type == 'local':
                 filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_local_mut_info_matrix.npy')
                 print(filename)
+            elif mi_type == 'higher_order':
+                filename = os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'F_higher_order_tc.npy')
 
             # check if the file already exists and overwrite is set to False
             if os.path.isfile(filename) and not overwrite:
@@ -146,9 +528,25 @@ if __name__ == '__main__':
                 F = F[:, 1000:6000]
 
                 if mi_type == 'global':
-                    global_mi(F, sdir)
+                    global_mi(F, sdir, precision)
+                elif mi_type == 'gcmi':
+                    gcmi(F, sdir, precision)
                 elif mi_type == 'local':
-                    local_mi(F, sdir)
+                    local_mi(F, sdir, precision)
+                elif mi_type == 'higher_order':
+                    n = len(F)
+                    if triplet_selection == 'all':
+                        triplets = all_triplets(n)
+                    elif triplet_selection == 'sample':
+                        n_triplets = int(sys.argv[6]) if len(sys.argv) > 6 else 100000
+                        triplets = sample_triplets(n, n_triplets)
+                    elif triplet_selection == 'spatial':
+                        radius = float(sys.argv[6]) if len(sys.argv) > 6 else 100.0
+                        stat = np.load(os.path.join(sdir, 'bigtiffs', 'suite2p', 'plane0', 'stat.npy'), allow_pickle=True)
+                        stat = stat[iscell[:, 0] == 1]
+                        centroids = np.array([s['med'] for s in stat], dtype=np.float64)
+                        triplets = spatial_triplets(centroids, radius)
+                    higher_order_mi(F, sdir, triplets, local=triplet_selection != 'all', precision=precision)
 
                 print(f'{sdir} saved')
                 print(strftime("%Y-%m-%d %H:%M:%S", gmtime()))  
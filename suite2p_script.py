@@ -117,6 +117,17 @@ def get_tifs(input_path):
     return tif_files
 
 
+def get_binning(input_path, tif_files):
+    # Read the spatial and temporal bin factors recorded by tif_to_video in the bigTIFF metadata
+    # (bigTIFFs written without binning have no bin factors, i.e. 1)
+    with TiffFile(os.path.join(input_path, tif_files[0])) as tif:
+        metadata = tif.shaped_metadata[0] if tif.shaped_metadata else {}
+    spatial_bin = int(metadata.get('spatial_bin', 1))
+    temporal_bin = int(metadata.get('temporal_bin', 1))
+    print(f'Spatial bin: {spatial_bin}, temporal bin: {temporal_bin}')
+    return spatial_bin, temporal_bin
+
+
 def run_suite2p(ops, input_path, tif_files):
     # Run Suite2P
     # provide an h5 path in 'h5py' or a tiff path in 'data_path'
@@ -129,6 +140,11 @@ def run_suite2p(ops, input_path, tif_files):
     #'input_format':'TIF'
     }
 
+    # scale the frame rate and cell diameter to the binning of the bigTIFFs
+    spatial_bin, temporal_bin = get_binning(input_path, tif_files)
+    db['fs'] = ops['fs'] / temporal_bin
+    db['diameter'] = max(1, round(ops['diameter'] / spatial_bin))
+
     now = datetime.now()
 
     current_time = now.strftime("%H:%M:%S")
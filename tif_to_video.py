@@ -1,15 +1,201 @@
 import cv2
 import os
 import sys
+import queue
+import threading
 import numpy as np
 from tqdm import tqdm
 from PIL import Image
 from tifffile import TiffWriter
 
-def tif_to_video(input_path, output_filename, chunk=None, downsample_resolution=None):
+def sort_tif_files(input_path):
+    """Lists the .TIF images in a directory, ordered by the frame number following 'p' in the filename.
+
+    Args:
+        input_path (str): The path to the directory containing the TIFF images.
+
+    Returns:
+        list: The sorted TIFF filenames (empty if there are none).
+    """
+    tif_files = [f for f in os.listdir(input_path) if f.endswith('.TIF')]
+
+    # Sort image filenames by number following 'p' in filename
+    framenums = []
+    for tif_file in tif_files:
+        p_idx = tif_file.find('p')
+        underscore_idx = tif_file[p_idx:].find('_')
+        framenum = tif_file[p_idx+1:p_idx+underscore_idx]
+        framenums.append(int(framenum))
+    
+    # order filenames in a list
+    return [tif_file for _, tif_file in sorted(zip(framenums, tif_files))]
+
+def write_bigtiff(filename, frames, compression=None, predictor=True, tile=None, maxworkers=None, metadata=None):
+    """Writes a stack of frames to a bigTIFF file, optionally with lossless compression.
+
+    Without compression, each frame is written as its own page. With compression, the whole stack is
+    written in one call so that tifffile compresses the pages (strips or tiles) in parallel worker threads.
+    Both layouts are read by Suite2P in the same way.
+
+    Args:
+        filename (str): The output bigTIFF filename.
+        frames (numpy.ndarray): The frames to write, with shape (frames, height, width).
+        compression (str, optional): Lossless codec, e.g. 'zlib', 'zstd', 'lzma' or 'lzw' (codecs other than
+            'zlib' and 'lzma' need the imagecodecs package). Defaults to None (uncompressed).
+        predictor (bool, optional): Whether to apply the horizontal differencing predictor before compression,
+            which usually improves the compression ratio of microscopy images. Defaults to True.
+        tile (tuple, optional): Tile shape (height, width), both multiples of 16. Defaults to None (strips).
+        maxworkers (int, optional): Number of threads used to compress pages. Defaults to None (chosen by tifffile).
+        metadata (dict, optional): Metadata stored with the frames. Defaults to None (i.e., {'fps': 20.0}).
+    
+    Returns:
+        None
+    """
+    if metadata is None:
+        metadata = {'fps':20.0}
+    with TiffWriter(filename, bigtiff=True) as tif:
+        if compression is None:
+            for frame in frames:
+                tif.write(frame, metadata=metadata)
+        else:
+            # minisblack stops tifffile from storing 3- or 4-frame stacks as one RGB(A) page; planarconfig
+            # is left unset because planarconfig='contig' would store them as one page of 3 or 4 samples
+            tif.write(frames, photometric='minisblack', compression=compression, predictor=predictor,
+                      tile=tile, maxworkers=maxworkers, metadata=metadata)
+
+def bin_frames(frames, spatial_bin=1, temporal_bin=1, dtype=np.float32):
+    """Bins a stack of frames by block-averaging pixels and averaging consecutive frames.
+
+    All bins are computed at once on the whole stack. Frames and pixels that do not fill a whole bin at the 
+    end of each axis are dropped.
+
+    Args:
+        frames (numpy.ndarray): The frames to bin, with shape (frames, height, width).
+        spatial_bin (int, optional): Number of pixels along each side of a spatial bin. Defaults to 1.
+        temporal_bin (int, optional): Number of consecutive frames averaged into one. Defaults to 1.
+        dtype (numpy.dtype, optional): The dtype of the binned frames. Integer dtypes are rounded to the 
+            nearest value. Defaults to float32.
+
+    Returns:
+        numpy.ndarray: The binned frames, with shape 
+            (frames // temporal_bin, height // spatial_bin, width // spatial_bin).
+    """
+    T, H, W = frames.shape
+    T, H, W = T // temporal_bin, H // spatial_bin, W // spatial_bin
+    frames = frames[:T*temporal_bin, :H*spatial_bin, :W*spatial_bin]
+    frames = frames.reshape(T, temporal_bin, H, spatial_bin, W, spatial_bin)
+
+    # accumulate in float32 unless the bin sums could exceed its exact integer range (2**24)
+    accumulator = np.float32
+    if frames.dtype == np.float64:
+        accumulator = np.float64
+    elif np.issubdtype(frames.dtype, np.integer) and np.iinfo(frames.dtype).max * spatial_bin**2 * temporal_bin >= 2**24:
+        accumulator = np.float64
+    binned = frames.mean(axis=(1, 3, 5), dtype=accumulator)
+
+    if np.issubdtype(dtype, np.integer):
+        binned = np.rint(binned)
+    return binned.astype(dtype, copy=False)
+
+def carry_over(frames, leftover, temporal_bin):
+    """Prepends the frames left over from the previous batch and splits off those that do not fill a whole temporal bin.
+
+    Args:
+        frames (numpy.ndarray): The new batch of frames, with shape (frames, height, width).
+        leftover (numpy.ndarray): Frames left over from the previous batch, or None.
+        temporal_bin (int): Number of consecutive frames averaged into one.
+
+    Returns:
+        tuple: The frames filling whole temporal bins, and the new leftover frames.
+    """
+    if leftover is not None:
+        frames = np.concatenate((leftover, frames))
+    n_binned = len(frames) // temporal_bin * temporal_bin
+    return frames[:n_binned], frames[n_binned:]
+
+def estimate_contrast_limits(input_path, tif_files, n_sample=100, percentiles=(1, 99.5)):
+    """Estimates display contrast limits from a strided sample of the frames.
+
+    Args:
+        input_path (str): The path to the directory containing the TIFF images.
+        tif_files (list): The TIFF filenames, ordered by frame number.
+        n_sample (int, optional): Approximate number of frames to sample. Defaults to 100.
+        percentiles (tuple, optional): Lower and upper intensity percentiles used as limits. Defaults to (1, 99.5).
+
+    Returns:
+        tuple: The (lower, upper) intensity limits.
+    """
+    stride = max(1, len(tif_files) // n_sample)
+    sample = np.stack([cv2.imread(os.path.join(input_path, f), 0) for f in tif_files[::stride]])
+    lower, upper = np.percentile(sample, percentiles)
+    return float(lower), float(max(upper, lower + 1))
+
+def preview_encoder(frame_queue, filename, fps, contrast_limits, spatial_bin=1, temporal_bin=1, block_size=100):
+    """Encodes batches of frames from a queue into an 8-bit MJPG AVI preview movie.
+
+    Meant to run in a worker thread alongside the bigTIFF export: batches of frames (frames, height, width) 
+    are put on the queue as they are decoded, and None signals the end of the movie. Frames left over from
+    an incomplete temporal bin are carried over to the next batch (and dropped at the end of the movie).
+    Each batch is binned and scaled in blocks of about block_size frames to bound the float32 temporaries.
+
+    Args:
+        frame_queue (queue.Queue): Queue of frame batches, terminated by None.
+        filename (str): The output AVI filename.
+        fps (float): Frame rate of the preview movie.
+        contrast_limits (tuple): The (lower, upper) intensity limits mapped to 0 and 255.
+        spatial_bin (int, optional): Number of pixels along each side of a spatial bin. Defaults to 1.
+        temporal_bin (int, optional): Number of consecutive frames averaged into one. Defaults to 1.
+        block_size (int, optional): Approximate number of input frames binned and scaled at once. Defaults to 100.
+    
+    Returns:
+        None
+    """
+    lower, upper = contrast_limits
+    scale = 255 / (upper - lower)
+    # whole number of temporal bins per block
+    step = max(1, block_size // temporal_bin) * temporal_bin
+    out = None
+    leftover = None
+    failed = False
+
+    while True:
+        frames = frame_queue.get()
+        if frames is None:
+            break
+        # keep draining the queue after a failure so that the export is not blocked
+        if failed:
+            continue
+
+        try:
+            frames, leftover = carry_over(frames, leftover, temporal_bin)
+
+            for b in range(0, len(frames), step):
+                # bin, then scale to the contrast limits and convert to 8-bit
+                block = bin_frames(frames[b:b+step], spatial_bin, temporal_bin)
+                block -= lower
+                block *= scale
+                block = np.clip(block, 0, 255, out=block).astype(np.uint8)
+
+                if out is None:
+                    height, width = block.shape[1:]
+                    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+                    out = cv2.VideoWriter(filename, fourcc, fps, (width, height), isColor=False)
+                for frame in block:
+                    out.write(frame)
+        except Exception as e:
+            print(f'Preview encoding failed: {e}')
+            failed = True
+
+    if out is not None:
+        out.release()
+
+def tif_to_video(input_path, output_filename, chunk=None, downsample_resolution=None,
+                 compression=None, predictor=True, tile=None, maxworkers=None,
+                 preview=False, preview_spatial_bin=1, preview_temporal_bin=1, spatial_bin=1, temporal_bin=1,
+                 batch_size=500):
     
     """Converts a series of TIFF images into a video file and exports each chunk of TIFFs separately in bigTIFF format.
-    Also exports an Avi file.
+    Optionally also exports an AVI preview movie, encoded in a worker thread from the same decoded frames.
     
     Args:
         input_path (str): The path to the directory containing the TIFF images.
@@ -20,31 +206,43 @@ def tif_to_video(input_path, output_filename, chunk=None, downsample_resolution=
         downsample_resolution (tuple, optional): A tuple of integers (width, height) specifying the desired resolution 
             to downsample each TIFF image to. If specified, each TIFF image will be downsampled to the given resolution 
             before being added to the video file. Defaults to None (i.e., no downsampling will be performed).
+        compression (str, optional): Lossless codec for the bigTIFF files (see write_bigtiff). Defaults to None 
+            (i.e., uncompressed).
+        predictor (bool, optional): Whether to apply the horizontal predictor when compressing. Defaults to True.
+        tile (tuple, optional): Tile shape (height, width) when compressing. Defaults to None (i.e., strips).
+        maxworkers (int, optional): Number of threads used to compress pages. Defaults to None.
+        preview (bool, optional): Whether to export an AVI preview movie to {input_path}/avi, contrast-scaled 
+            using limits estimated from a strided sample of frames. Defaults to False.
+        preview_spatial_bin (int, optional): Spatial bin size of the preview movie, on top of spatial_bin. Defaults to 1.
+        preview_temporal_bin (int, optional): Number of frames averaged into each preview frame, on top of 
+            temporal_bin. Defaults to 1.
+        spatial_bin (int, optional): Block size for block-mean spatial binning of the exported frames. The bin 
+            factors are recorded in the bigTIFF metadata so that suite2p_script can scale ops['diameter']. 
+            Defaults to 1 (i.e., no binning).
+        temporal_bin (int, optional): Number of consecutive frames averaged into each exported frame; the frame 
+            rate recorded in the bigTIFF metadata is 20 / temporal_bin. Defaults to 1 (i.e., no binning).
+        batch_size (int, optional): Number of TIFF files decoded at a time; each batch is binned and handed to 
+            the preview encoder as soon as it is decoded. Defaults to 500.
     
     Returns:
         None
         
     Raises:
-        None
+        ValueError: If a bin factor is smaller than 1.
     
     """
 
-    # List of TIF files
-    tif_files = [f for f in os.listdir(input_path) if f.endswith('.TIF')]
+    # Check the bin factors
+    for name, value in [('spatial_bin', spatial_bin), ('temporal_bin', temporal_bin),
+                        ('preview_spatial_bin', preview_spatial_bin), ('preview_temporal_bin', preview_temporal_bin)]:
+        if int(value) != value or value < 1:
+            raise ValueError(f'{name} must be an integer of at least 1, got {value}')
+
+    # List of TIF files, ordered by frame number
+    tif_files = sort_tif_files(input_path)
     if len(tif_files)==0:
         print('No TIFF files found in the specified directory.')
         sys.exit()
-
-    # Sort image filenames by number following 'p' in filename
-    framenums = []
-    for tif_file in tif_files:
-        p_idx = tif_file.find('p')
-        underscore_idx = tif_file[p_idx:].find('_')
-        framenum = tif_file[p_idx+1:p_idx+underscore_idx]
-        framenums.append(int(framenum))
-    
-    # order filenames in a list
-    tif_files = [tif_file for _, tif_file in sorted(zip(framenums, tif_files))]
     
     # take the first 5 minutes of data
     tif_files = tif_files[:6000]
@@ -58,54 +256,74 @@ def tif_to_video(input_path, output_filename, chunk=None, downsample_resolution=
     else:
         tif_files_chunks = [tif_files]
 
-    for i, tif_files_chunk in enumerate(tif_files_chunks):
-        # Initialize an empty list to hold the image data for the chunk
-        arr_list = []
+    # frame rate and bin factors of the exported frames
+    fps = 20.0 / temporal_bin
+    metadata = {'fps': fps, 'spatial_bin': spatial_bin, 'temporal_bin': temporal_bin}
+    leftover = None
 
-        # Iterate over the TIF files in the chunk, import and add each TIF frame to arr_list
-        for tif_file in tqdm(tif_files_chunk, desc=f'Chunk {i+1}/{len(tif_files_chunks)}'):
-            img = cv2.imread(os.path.join(input_path, tif_file), 0) # read in grayscale
-            if downsample_resolution is not None:
-                img = cv2.resize(img, downsample_resolution)
-            img = img[...,None] # add third dimension (i.e., frame)
-            arr_list.append(img)
+    # number of bigTIFF files written, so that chunks emptied by temporal binning leave no gaps in the numbering
+    n_written = 0
 
-        # concatenate frames into numpy array
-        tiff_arr = np.concatenate(arr_list, axis=2)
+    # Start the preview encoder, which receives each chunk of frames once they are decoded
+    if preview:
+        if not os.path.exists(f'{input_path}/avi'):
+            os.makedirs(f'{input_path}/avi')
+        contrast_limits = estimate_contrast_limits(input_path, tif_files)
+        print(f'Preview contrast limits: {contrast_limits}')
+        frame_queue = queue.Queue(maxsize=2)
+        encoder = threading.Thread(
+            target=preview_encoder,
+            args=(frame_queue, f'{input_path}/avi/{output_filename}.avi', fps / preview_temporal_bin, 
+                  contrast_limits, preview_spatial_bin, preview_temporal_bin),
+        )
+        encoder.start()
 
-        # export numpy array in bigTIFF format at 20 FPS
-        with TiffWriter(f'{input_path}/bigtiffs/{output_filename}_chunk{i+1}.tif', bigtiff=True) as tif:
-            for frame in np.transpose(tiff_arr,(2,0,1)):
-                tif.write(frame, metadata={'fps':20.0})
+    try:
+        for i, tif_files_chunk in enumerate(tif_files_chunks):
+            # Initialize an empty list to hold the (binned) frames of the chunk
+            chunk_frames = []
 
-    ### AVI ###
-    #Define the output video file name and format
-    # output_file = f'{output_filename}.avi'
+            # Decode the chunk in batches, binning each batch and handing it to the preview encoder as soon
+            # as it is decoded so that encoding overlaps with decoding
+            progress = tqdm(total=len(tif_files_chunk), desc=f'Chunk {i+1}/{len(tif_files_chunks)}')
+            for b in range(0, len(tif_files_chunk), batch_size):
+                # Iterate over the TIF files in the batch, import and add each TIF frame to arr_list
+                arr_list = []
+                for tif_file in tif_files_chunk[b:b+batch_size]:
+                    img = cv2.imread(os.path.join(input_path, tif_file), 0) # read in grayscale
+                    if downsample_resolution is not None:
+                        img = cv2.resize(img, downsample_resolution)
+                    arr_list.append(img)
+                    progress.update()
 
-    # # Define the FourCC code, which specifies the video codec
-    # fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-
-    # # Get the dimensions of the first TIF file
-    # img = cv2.imread(os.path.join(input_path, tif_files[0]))
-    # height, width = img.shape[:2]
-
-    # if not os.path.exists(f'{input_path}/avi'):
-    #     os.makedirs(f'{input_path}/avi')
-    # # Initialize the VideoWriter object, specifying that the images are not in color format
-    # out = cv2.VideoWriter(f'{input_path}/avi/{output_file}', fourcc, 20.0, (width, height), isColor=False)
-
-    
-    # #Iterate over the TIF files, normalize, and add each frame to that video
-    # for tif_file in tqdm(tif_files):
-    #     img = cv2.imread(os.path.join(input_path, tif_file), -1)
+                # stack frames into numpy array (frames, height, width)
+                frames = np.stack(arr_list)
 
-    #     # KEY STEP - normalize all images using 4096 (max intensity for 16-bit images), multiply by 255 (max for 8-bit), and convert to 8-bit
-    #     img = ((img/4096) * 255).astype(np.uint8)
+                # bin the batch at once, carrying frames of an incomplete temporal bin over to the next batch
+                if spatial_bin > 1 or temporal_bin > 1:
+                    frames, leftover = carry_over(frames, leftover, temporal_bin)
+                    if len(frames) == 0:
+                        continue
+                    frames = bin_frames(frames, spatial_bin, temporal_bin, dtype=frames.dtype)
 
-    #     #output image
-    #     out.write(img)
+                # hand the frames to the preview encoder
+                if preview:
+                    frame_queue.put(frames)
+                chunk_frames.append(frames)
+            progress.close()
 
-    # # Release the VideoWriter object
-    # out.release()
+            # all frames of the chunk may still be waiting for a whole temporal bin
+            if len(chunk_frames) == 0:
+                continue
+            n_written += 1
 
+            # export numpy array in bigTIFF format at 20 FPS (divided by the temporal bin)
+            write_bigtiff(f'{input_path}/bigtiffs/{output_filename}_chunk{n_written}.tif', np.concatenate(chunk_frames),
+                          compression=compression, predictor=predictor, tile=tile, maxworkers=maxworkers,
+                          metadata=metadata)
 
+    # Finish the preview movie, also when the export fails, so that the encoder thread exits
+    finally:
+        if preview:
+            frame_queue.put(None)
+            encoder.join()
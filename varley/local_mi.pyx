@@ -8,6 +8,7 @@ Created on Thu May  4 22:18:28 2023
 
 import cython
 cimport cython
+from cython cimport floating
 
 import numpy as np
 cimport numpy as np 
@@ -19,12 +20,17 @@ from cython.parallel import prange
 cdef double _SQRT_2PI = sqrt(2.0*pi)
 cdef double _2PI = 2.0*pi
 
+# The public functions accept either float32 or float64 arrays (the `floating` fused type)
+# and return their output in the same precision as the input. The per-sample arithmetic
+# (log, exp, the Gaussian normalisation) is always carried out in double precision, so a
+# float32 run only changes the precision of the stored inputs and outputs.
+
 
 @cython.wraparound(False)
 @cython.initializedcheck(False)
 @cython.cdivision(True)
 @cython.boundscheck(False)
-cdef double _mean(double[:] X):
+cdef double _mean(floating[:] X):
     """
     Calculates the mean of a 1-dimensional array. 
     """
@@ -42,7 +48,7 @@ cdef double _mean(double[:] X):
 @cython.initializedcheck(False)
 @cython.cdivision(True)
 @cython.boundscheck(False)
-cdef double _var(double[:] X):
+cdef double _var(floating[:] X):
     """
     Calculates the variance of a 1-dimensional array.
     """
@@ -61,7 +67,7 @@ cdef double _var(double[:] X):
 @cython.initializedcheck(False)
 @cython.cdivision(True)
 @cython.boundscheck(False)
-cdef double _std(double[:] X):
+cdef double _std(floating[:] X):
     """
     Calculates the standard deviation of a 1-dimensional array.
     """
@@ -104,7 +110,7 @@ cdef double _local_entropy(double x, double mu, double sigma) nogil:
 @cython.wraparound(False)
 @cython.boundscheck(False)
 @cython.cdivision(True)
-cdef double _gaussian_nd(double[:] x, double[:] mu, double[:,:] cov, double[:,:] inv, double det):
+cdef double _gaussian_nd(floating[:] x, double[:] mu, double[:,:] cov, double[:,:] inv, double det):
     """
     Calculates the probability of an n-dimensional Gaussian.
     Requires pre-computing important values such as the mu, covariance matrix,
@@ -133,14 +139,14 @@ cdef double _gaussian_nd(double[:] x, double[:] mu, double[:,:] cov, double[:,:]
 @cython.initializedcheck(False)
 @cython.wraparound(False)
 @cython.boundscheck(False)
-cdef double _local_entropy_nd(double[:] vec, double[:] mu, double[:,:] cov, double[:,:] inv, double det):
+cdef double _local_entropy_nd(floating[:] vec, double[:] mu, double[:,:] cov, double[:,:] inv, double det):
     return -1.0*log(_gaussian_nd(vec, mu, cov, inv, det))
 
 
 @cython.initializedcheck(False)
 @cython.wraparound(False)
 @cython.boundscheck(False)
-def local_entropy_series_nd(double[:,:] X):
+cdef double[:] _local_entropy_series_nd(floating[:,:] X):
     
     cdef int N0 = X.shape[0]
     cdef int N1 = X.shape[1]
@@ -171,27 +177,39 @@ def local_entropy_series_nd(double[:,:] X):
         for i in range(N1):
             ents[i] = _local_entropy_nd(X[:,i], mu, cov, inv, det)
     
-    return np.array(ents)
+    return ents
+
+
+def local_entropy_series_nd(floating[:,:] X):
+    """
+    Returns the local joint entropy for every column in a multidimensional timeseries X,
+    in the same precision as X.
+    """
+    if floating is float:
+        return np.asarray(_local_entropy_series_nd(X), dtype=np.float32)
+    else:
+        return np.asarray(_local_entropy_series_nd(X), dtype=np.float64)
 
 @cython.wraparound(False)
 @cython.initializedcheck(False)
 @cython.boundscheck(False)
 @cython.cdivision(True)
-def local_total_correlation(double[:,:] X):
+def local_total_correlation(floating[:,:] X):
     """
     Returns the local total correlation (integration) for every column in a muldimensional
     timeseries X. 
     
     If X.shape[0] == 2, returns the local mutual information (analagous to an edge time series.)
+    X may be float32 or float64; the result has the same dtype as X.
     """
     cdef int N0 = X.shape[0]
     cdef int N1 = X.shape[1]
     
-    cdef double[:] mu = np.mean(X, axis=1)   
-    cdef double[:] sigma = np.var(X, axis=1)
+    cdef double[:] mu = np.mean(X, axis=1, dtype=np.float64)   
+    cdef double[:] sigma = np.var(X, axis=1, dtype=np.float64)
     
     cdef int i, j
-    cdef double[:] joint_ents = local_entropy_series_nd(X)
+    cdef double[:] joint_ents = _local_entropy_series_nd(X)
     cdef double[:] sum_marg_ents = np.zeros(N1)
     cdef double mul
     
@@ -199,28 +217,31 @@ def local_total_correlation(double[:,:] X):
         for j in range(N0):
             sum_marg_ents[i] += _local_entropy(X[j,i], mu[j], sigma[j])
         
-    return np.subtract(sum_marg_ents, joint_ents)
+    if floating is float:
+        return np.subtract(sum_marg_ents, joint_ents).astype(np.float32)
+    else:
+        return np.subtract(sum_marg_ents, joint_ents)
 
 @cython.wraparound(False)
 @cython.initializedcheck(False)
 @cython.boundscheck(False)
 @cython.cdivision(True)
-def local_total_correlation_v2(double[:] x, double[:] y):
+def local_total_correlation_v2(floating[:] x, floating[:] y):
     """
     Returns the local total correlation (integration) for every column in a muldimensional
     timeseries X. 
     
     If X.shape[0] == 2, returns the local mutual information (analagous to an edge time series.)
     """
-    cdef X = np.vstack((x, y))
+    cdef floating[:,:] X = np.vstack((x, y))
     cdef int N0 = X.shape[0]
     cdef int N1 = X.shape[1]
     
-    cdef double[:] mu = np.mean(X, axis=1)   
-    cdef double[:] sigma = np.var(X, axis=1)
+    cdef double[:] mu = np.mean(X, axis=1, dtype=np.float64)   
+    cdef double[:] sigma = np.var(X, axis=1, dtype=np.float64)
     
     cdef int i, j
-    cdef double[:] joint_ents = local_entropy_series_nd(X)
+    cdef double[:] joint_ents = _local_entropy_series_nd(X)
     cdef double[:] sum_marg_ents = np.zeros(N1)
     cdef double mul
     
@@ -228,7 +249,10 @@ def local_total_correlation_v2(double[:] x, double[:] y):
         for j in range(N0):
             sum_marg_ents[i] += _local_entropy(X[j,i], mu[j], sigma[j])
         
-    return np.subtract(sum_marg_ents, joint_ents)
+    if floating is float:
+        return np.subtract(sum_marg_ents, joint_ents).astype(np.float32)
+    else:
+        return np.subtract(sum_marg_ents, joint_ents)
 
 """
 #UNIT TEST FOR TC